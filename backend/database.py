@@ -1,6 +1,9 @@
 import sqlite3
 import json
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from uuid import UUID
 
@@ -9,84 +12,248 @@ DB_NAME = os.environ.get("DB_NAME", "scrabble.db")
 if os.environ.get("VERCEL"):
     DB_NAME = "/tmp/scrabble.db"
 
+# Number of connections kept open for the lifetime of the process
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_pool_lock = threading.Lock()
+_pool_opened = 0
+
+def dict_factory(cursor, row):
+    # Rows come back as plain dicts, ready to be returned from the routes
+    fields = [column[0] for column in cursor.description]
+    return dict(zip(fields, row))
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    conn.row_factory = dict_factory
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-20000;
+        PRAGMA foreign_keys=ON;
+    """)
     return conn
 
+def _acquire():
+    global _pool_opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+
+    # Open connections lazily until the pool is full, then wait for one to be released
+    with _pool_lock:
+        if _pool_opened < POOL_SIZE:
+            conn = get_db_connection()
+            _pool_opened += 1
+            return conn
+    return _pool.get()
+
+def _release(conn):
+    # Never hand out a connection with a half-finished transaction
+    if conn.in_transaction:
+        conn.rollback()
+    _pool.put(conn)
+
+@contextmanager
+def connection():
+    conn = _acquire()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+def warm_pool():
+    # Open the whole pool up front so early requests skip connecting,
+    # the pragma setup and loading the schema
+    global _pool_opened
+    with _pool_lock:
+        while _pool_opened < POOL_SIZE:
+            conn = get_db_connection()
+            conn.execute("SELECT 1 FROM games LIMIT 0")
+            _pool_opened += 1
+            _pool.put(conn)
+
+@contextmanager
+def write_transaction(conn):
+    # Take the write lock up front so the reads inside see the state being written
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def close_pool():
+    global _pool_opened
+    with _pool_lock:
+        while True:
+            try:
+                conn = _pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            _pool_opened -= 1
+
+# Bump whenever SCHEMA changes so existing databases re-run it on startup
+SCHEMA_VERSION = 6
+
+SCHEMA = '''
+    -- Players table
+    CREATE TABLE IF NOT EXISTS players (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        number TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(name, number)
+    );
+
+    -- Games table
+    -- Added 'name' column
+    CREATE TABLE IF NOT EXISTS games (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        turn_duration INTEGER NOT NULL,
+        current_turn_index INTEGER DEFAULT 0,
+        turn_started_at REAL, -- Unix seconds
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ended_at TIMESTAMP
+    );
+
+    -- Teams table
+    CREATE TABLE IF NOT EXISTS teams (
+        id TEXT PRIMARY KEY,
+        game_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        score INTEGER DEFAULT 0,
+        FOREIGN KEY (game_id) REFERENCES games (id)
+    );
+
+    -- Game Players (Linking Teams to Players)
+    CREATE TABLE IF NOT EXISTS game_players (
+        game_id TEXT NOT NULL,
+        team_id TEXT NOT NULL,
+        player_id TEXT NOT NULL,
+        FOREIGN KEY (game_id) REFERENCES games (id),
+        FOREIGN KEY (team_id) REFERENCES teams (id),
+        FOREIGN KEY (player_id) REFERENCES players (id)
+    );
+
+    -- Turns table
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        turn_number INTEGER NOT NULL,
+        game_id TEXT NOT NULL,
+        team_id TEXT NOT NULL,
+        player_id TEXT NOT NULL,
+        base_score INTEGER NOT NULL,
+        bingo BOOLEAN NOT NULL,
+        total_score INTEGER NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (game_id) REFERENCES games (id),
+        FOREIGN KEY (team_id) REFERENCES teams (id),
+        FOREIGN KEY (player_id) REFERENCES players (id)
+    );
+
+    -- Per-player totals over finished games, added to by end_game
+    CREATE TABLE IF NOT EXISTS player_stats (
+        player_id TEXT PRIMARY KEY,
+        total_games INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        total_score INTEGER NOT NULL DEFAULT 0,
+        high_score_solo INTEGER NOT NULL DEFAULT 0,
+        high_score_duo INTEGER NOT NULL DEFAULT 0,
+        high_score_trio INTEGER NOT NULL DEFAULT 0,
+        high_score_group INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (player_id) REFERENCES players (id)
+    );
+
+    -- Recompute the totals from every finished game so far
+    INSERT OR REPLACE INTO player_stats (
+        player_id, total_games, wins, total_score,
+        high_score_solo, high_score_duo, high_score_trio, high_score_group
+    )
+    SELECT gp.player_id,
+           COUNT(*),
+           SUM(t.score = w.winning_score AND t.score > 0),
+           SUM(t.score),
+           MAX(CASE WHEN s.team_size = 1 THEN MAX(t.score, 0) ELSE 0 END),
+           MAX(CASE WHEN s.team_size = 2 THEN MAX(t.score, 0) ELSE 0 END),
+           MAX(CASE WHEN s.team_size = 3 THEN MAX(t.score, 0) ELSE 0 END),
+           MAX(CASE WHEN s.team_size > 3 THEN MAX(t.score, 0) ELSE 0 END)
+    FROM game_players gp
+    JOIN players p ON p.id = gp.player_id
+    JOIN teams t ON t.id = gp.team_id
+    JOIN games g ON g.id = t.game_id AND g.status = 'finished'
+    JOIN (SELECT team_id, COUNT(*) AS team_size FROM game_players GROUP BY team_id) s ON s.team_id = t.id
+    JOIN (SELECT game_id, MAX(score) AS winning_score FROM teams GROUP BY game_id) w ON w.game_id = t.game_id
+    GROUP BY gp.player_id;
+
+    -- Convert turn start times written as ISO strings to Unix seconds. Empty
+    -- values mean no start time; unparseable ones become 0 so their timer
+    -- reads as expired, as it did when they were parsed on every read.
+    UPDATE games SET turn_started_at = CASE
+        WHEN turn_started_at = '' THEN NULL
+        ELSE COALESCE((julianday(turn_started_at) - 2440587.5) * 86400.0, 0)
+    END
+    WHERE typeof(turn_started_at) = 'text';
+
+    -- Player search index. The trigram tokenizer lets FTS5 answer the
+    -- substring LIKE patterns used by search_players from its index. It keeps
+    -- its own copy of the columns keyed by player id, since players has no
+    -- INTEGER PRIMARY KEY and VACUUM may renumber its rowids. Rebuilt from
+    -- players whenever the schema is re-applied.
+    DROP TRIGGER IF EXISTS players_fts_insert;
+    DROP TRIGGER IF EXISTS players_fts_delete;
+    DROP TRIGGER IF EXISTS players_fts_update;
+    DROP TABLE IF EXISTS players_fts;
+    CREATE VIRTUAL TABLE players_fts USING fts5(id UNINDEXED, name, number, tokenize='trigram');
+    INSERT INTO players_fts (id, name, number) SELECT id, name, number FROM players;
+
+    CREATE TRIGGER players_fts_insert AFTER INSERT ON players BEGIN
+        INSERT INTO players_fts (id, name, number) VALUES (new.id, new.name, new.number);
+    END;
+    -- The app never deletes or renames players, so these rarely fire and the
+    -- scan on the unindexed id column is acceptable
+    CREATE TRIGGER players_fts_delete AFTER DELETE ON players BEGIN
+        DELETE FROM players_fts WHERE id = old.id;
+    END;
+    -- Skip no-op updates such as register_player's upsert of an existing player
+    CREATE TRIGGER players_fts_update AFTER UPDATE OF id, name, number ON players
+    WHEN old.id IS NOT new.id OR old.name IS NOT new.name OR old.number IS NOT new.number BEGIN
+        UPDATE players_fts SET id = new.id, name = new.name, number = new.number WHERE id = old.id;
+    END;
+
+    -- Indexes for the per-game lookups done on every request
+    -- Turns are only looked up by game, latest first (undo_last_turn)
+    DROP INDEX IF EXISTS idx_turns_game_team;
+    CREATE INDEX IF NOT EXISTS idx_turns_game ON turns (game_id);
+    CREATE INDEX IF NOT EXISTS idx_teams_game ON teams (game_id);
+    CREATE INDEX IF NOT EXISTS idx_gp_team ON game_players (team_id);
+    CREATE INDEX IF NOT EXISTS idx_games_status_ended ON games (status, ended_at DESC);
+'''
+
 def init_db():
     conn = get_db_connection()
-    c = conn.cursor()
-
-    # Players table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            number TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(name, number)
-        )
-    ''')
-
-    # Games table
-    # Added 'name' column
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS games (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            status TEXT NOT NULL,
-            turn_duration INTEGER NOT NULL,
-            current_turn_index INTEGER DEFAULT 0,
-            turn_started_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            ended_at TIMESTAMP
-        )
-    ''')
-
-    # Teams table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS teams (
-            id TEXT PRIMARY KEY,
-            game_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            score INTEGER DEFAULT 0,
-            FOREIGN KEY (game_id) REFERENCES games (id)
-        )
-    ''')
-
-    # Game Players (Linking Teams to Players)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS game_players (
-            game_id TEXT NOT NULL,
-            team_id TEXT NOT NULL,
-            player_id TEXT NOT NULL,
-            FOREIGN KEY (game_id) REFERENCES games (id),
-            FOREIGN KEY (team_id) REFERENCES teams (id),
-            FOREIGN KEY (player_id) REFERENCES players (id)
-        )
-    ''')
-
-    # Turns table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS turns (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            turn_number INTEGER NOT NULL,
-            game_id TEXT NOT NULL,
-            team_id TEXT NOT NULL,
-            player_id TEXT NOT NULL,
-            base_score INTEGER NOT NULL,
-            bingo BOOLEAN NOT NULL,
-            total_score INTEGER NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (game_id) REFERENCES games (id),
-            FOREIGN KEY (team_id) REFERENCES teams (id),
-            FOREIGN KEY (player_id) REFERENCES players (id)
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    try:
+        # Already up to date: skip the DDL entirely
+        if conn.execute("PRAGMA user_version").fetchone()['user_version'] >= SCHEMA_VERSION:
+            return
+
+        conn.executescript(f"""
+            BEGIN;
+            {SCHEMA}
+            PRAGMA user_version = {SCHEMA_VERSION};
+            COMMIT;
+        """)
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
@@ -1,12 +1,18 @@
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID, uuid4
 from datetime import datetime, timezone
-import math
+import json
+import time
 import sqlite3
-from database import init_db, get_db_connection
+import threading
+from contextlib import contextmanager
+from cachetools import LRUCache, TTLCache
+from database import init_db, warm_pool, connection, write_transaction, close_pool, POOL_SIZE
 
 app = FastAPI()
 
@@ -26,8 +32,16 @@ app.add_middleware(
 )
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     init_db()
+    warm_pool()
+    # Sync routes run on AnyIO's worker threads and each holds one pooled
+    # connection, so extra threads would only block waiting for the pool
+    to_thread.current_default_thread_limiter().total_tokens = POOL_SIZE
+
+@app.on_event("shutdown")
+def shutdown_event():
+    close_pool()
 
 # --------------------
 # Models
@@ -56,6 +70,68 @@ class SubmitTurnRequest(BaseModel):
     base_score: int
     bingo: bool
 
+class CurrentTurn(BaseModel):
+    turn_number: int
+    team_id: str
+    player: str
+    started_at: Optional[datetime] # None for games that never got a start time
+    time_left: int
+
+class GameTeam(BaseModel):
+    id: str
+    name: str
+    players: List[str] # Player names
+    score: int
+
+class GameState(BaseModel):
+    game_id: str
+    status: str
+    turn_duration: int
+    current_turn: Optional[CurrentTurn]
+    teams: List[GameTeam]
+
+class TurnInfo(BaseModel):
+    turn_number: int
+    team_id: str
+    player: str
+    base_score: int
+    bingo: bool
+    total_score: int
+
+class NextTurn(BaseModel):
+    turn_number: int
+    team_id: str
+    player: str
+    started_at: datetime
+
+class LeaderboardEntry(BaseModel):
+    team_id: str
+    name: str
+    score: int
+
+class SubmitTurnResponse(BaseModel):
+    turn: TurnInfo
+    next_turn: NextTurn
+    leaderboard: List[LeaderboardEntry]
+
+class TeamScore(BaseModel):
+    id: str
+    score: int
+
+class UndoResponse(BaseModel):
+    reverted_turn_number: int
+    current_turn: NextTurn
+    teams: List[TeamScore]
+
+class HistoryEntry(BaseModel):
+    game_id: str
+    name: str
+    ended_at: datetime
+    winner: str
+    winner_players: List[str]
+    top_score: int
+    teams_count: int
+
 class PlayerStats(BaseModel):
     player_id: str
     name: str
@@ -69,12 +145,83 @@ class PlayerStats(BaseModel):
     high_score_trio: int
     high_score_group: int # >3 players
 
+# --------------------
+# Caches
+# --------------------
+
+# Thread-safe TTL cache for values loaded from the database. Every
+# invalidation bumps a version, and store() drops values whose load started
+# before the latest invalidation, so a read that overlapped a write cannot
+# put stale data back into the cache.
+class VersionedTTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def lookup(self, key) -> Tuple[Any, int]:
+        with self._lock:
+            return self._cache.get(key), self._version
+
+    def store(self, key, value, version: int):
+        with self._lock:
+            if version == self._version:
+                self._cache[key] = value
+
+    def replace(self, key, value):
+        # Write-through for writers holding the database write lock. Bumping the
+        # version drops any store() from a load that began before this write.
+        with self._lock:
+            self._cache[key] = value
+            self._version += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+            self._version += 1
+
+# Assembled game state without time_left, keyed by game_id.
+# Turn writes replace their game's state just before committing, while they
+# still hold the write lock, so the next poll is a hit and no load that
+# overlapped the write can be stored over it. The trade-off is that a poll may
+# see a turn a moment before its commit lands; game_write_transaction drops
+# the entry again if the commit fails.
+GAME_CACHE = VersionedTTLCache(maxsize=1024, ttl=30)
+
+# History list and per-player stats. Both only cover finished games, so they
+# are cleared when a game ends.
+RESULTS_CACHE = VersionedTTLCache(maxsize=1024, ttl=300)
+
+# Team rosters (ids, names, players) per game. Rosters are fixed once a game
+# is created, so only the scores are read from the database on a hit. Finished
+# games are still viewed on the results screen and age out of the LRU instead.
+TEAMS_CACHE: LRUCache = LRUCache(maxsize=1024)
+_teams_cache_lock = threading.Lock()
+
 # --------------------
 # Helpers
 # --------------------
 def now() -> datetime:
     return datetime.now(timezone.utc)
 
+def now_epoch() -> float:
+    # Turn start times are stored as Unix seconds so the timer needs no parsing
+    return time.time()
+
+@contextmanager
+def game_write_transaction(conn, game_id: str):
+    # write_transaction for routes that replace the game's cached state before
+    # committing; the cached state is dropped again if the commit does not happen
+    try:
+        with write_transaction(conn):
+            yield conn
+    except BaseException:
+        GAME_CACHE.invalidate(game_id)
+        raise
+
 def get_game_from_db(conn, game_id: str):
     game = conn.execute("SELECT * FROM games WHERE id = ?", (game_id,)).fetchone()
     if not game:
@@ -82,178 +229,167 @@ def get_game_from_db(conn, game_id: str):
     return game
 
 def get_teams_from_db(conn, game_id: str):
-    teams = conn.execute("SELECT * FROM teams WHERE game_id = ?", (game_id,)).fetchall()
-    teams_data = []
-    for team in teams:
-        players = conn.execute("""
-            SELECT p.id, p.name, p.number
-            FROM players p
-            JOIN game_players gp ON p.id = gp.player_id
-            WHERE gp.team_id = ?
-        """, (team['id'],)).fetchall()
-
-        teams_data.append({
-            "id": team['id'],
-            "name": team['name'],
-            "score": team['score'],
-            "players": [dict(p) for p in players] # Return full player objects
-        })
-    return teams_data
-
-def get_turns_from_db(conn, game_id: str):
-    return conn.execute("SELECT * FROM turns WHERE game_id = ? ORDER BY turn_number ASC", (game_id,)).fetchall()
-
-def calculate_time_left(turn_started_at_iso: Optional[str], turn_duration: int) -> int:
-    if not turn_started_at_iso:
-        return turn_duration
+    with _teams_cache_lock:
+        roster = TEAMS_CACHE.get(game_id)
 
-    try:
-        started_at = datetime.fromisoformat(turn_started_at_iso)
-        if started_at.tzinfo is None:
-            started_at = started_at.replace(tzinfo=timezone.utc)
-    except ValueError:
-        return 0
-
-    elapsed = (now() - started_at).total_seconds()
-    return max(0, turn_duration - math.floor(elapsed))
-
-# --------------------
-# Routes
-# --------------------
+    if roster is None:
+        # One query for every team and its players; teams keep their creation order
+        # since the turn rotation depends on it
+        rows = conn.execute("""
+            SELECT t.id AS team_id, t.name AS team_name, t.score,
+                   p.id, p.name, p.number
+            FROM teams t
+            LEFT JOIN game_players gp ON gp.team_id = t.id
+            LEFT JOIN players p ON p.id = gp.player_id
+            WHERE t.game_id = ?
+            ORDER BY t.rowid, gp.rowid
+        """, (game_id,)).fetchall()
+
+        teams_data = {}
+        scores = {}
+        for row in rows:
+            team = teams_data.get(row['team_id'])
+            if team is None:
+                team = teams_data[row['team_id']] = {
+                    "id": row['team_id'],
+                    "name": row['team_name'],
+                    "players": [] # Return full player objects
+                }
+                scores[row['team_id']] = row['score']
+            if row['id'] is not None:
+                team['players'].append({"id": row['id'], "name": row['name'], "number": row['number']})
 
-@app.get("/players", response_model=List[Player])
-def search_players(query: Optional[str] = None):
-    conn = get_db_connection()
-    if query:
-        wildcard = f"%{query}%"
-        players = conn.execute(
-            "SELECT * FROM players WHERE name LIKE ? OR number LIKE ?",
-            (wildcard, wildcard)
-        ).fetchall()
+        roster = list(teams_data.values())
+        with _teams_cache_lock:
+            TEAMS_CACHE[game_id] = roster
     else:
-        players = conn.execute("SELECT * FROM players ORDER BY created_at DESC LIMIT 50").fetchall()
-    conn.close()
-    return [dict(p) for p in players]
-
-@app.post("/players", response_model=Player)
-def register_player(req: PlayerCreate):
-    conn = get_db_connection()
-    try:
-        existing = conn.execute(
-            "SELECT * FROM players WHERE name = ? AND number = ?",
-            (req.name, req.number)
-        ).fetchone()
-
-        if existing:
-            conn.close()
-            return dict(existing)
-
-        new_id = str(uuid4())
-        conn.execute(
-            "INSERT INTO players (id, name, number, created_at) VALUES (?, ?, ?, ?)",
-            (new_id, req.name, req.number, now())
-        )
-        conn.commit()
-
-        player = conn.execute("SELECT * FROM players WHERE id = ?", (new_id,)).fetchone()
-        return dict(player)
-    except Exception as e:
-        conn.close()
-        raise HTTPException(400, f"Error registering player: {str(e)}")
-    finally:
-        conn.close()
-
-@app.get("/stats/players/{player_id}", response_model=PlayerStats)
-def get_player_stats(player_id: str):
-    conn = get_db_connection()
-    try:
-        player = conn.execute("SELECT * FROM players WHERE id = ?", (player_id,)).fetchone()
-        if not player:
-            raise HTTPException(404, "Player not found")
+        scores = {
+            row['id']: row['score']
+            for row in conn.execute("SELECT id, score FROM teams WHERE game_id = ?", (game_id,))
+        }
 
-        # Get all games/teams this player participated in
-        # We need teams where player was involved, and the game must be finished
-        rows = conn.execute("""
-            SELECT g.id as game_id, t.id as team_id, t.score as team_score,
-                   (SELECT COUNT(*) FROM game_players gp2 WHERE gp2.team_id = t.id) as team_size,
-                   (SELECT MAX(t2.score) FROM teams t2 WHERE t2.game_id = g.id) as winning_score
-            FROM game_players gp
-            JOIN teams t ON gp.team_id = t.id
-            JOIN games g ON t.game_id = g.id
-            WHERE gp.player_id = ? AND g.status = 'finished'
-        """, (player_id,)).fetchall()
+    return [{**team, "score": scores[team['id']]} for team in roster]
 
-        total_games = len(rows)
-        wins = 0
-        total_score = 0
+def get_team_turns_count(current_turn_index: int, team_count: int) -> int:
+    # Teams play round-robin, so the team on turn has already played this many times
+    return current_turn_index // team_count
 
-        high_score_solo = 0
-        high_score_duo = 0
-        high_score_trio = 0
-        high_score_group = 0
+def build_game_state(conn, game_id: str) -> Dict[str, Any]:
+    game = get_game_from_db(conn, game_id)
+    teams = get_teams_from_db(conn, game_id)
+    return assemble_game_state(game, teams)
 
-        for row in rows:
-            score = row['team_score']
-            total_score += score
-            if score == row['winning_score'] and score > 0: # Tie counts as win? Yes.
-                 wins += 1
-
-            size = row['team_size']
-            if size == 1:
-                high_score_solo = max(high_score_solo, score)
-            elif size == 2:
-                high_score_duo = max(high_score_duo, score)
-            elif size == 3:
-                high_score_trio = max(high_score_trio, score)
-            else:
-                high_score_group = max(high_score_group, score)
+def assemble_game_state(game: Dict[str, Any], teams: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if game['status'] == 'finished':
+        current_turn_info = None
+    else:
+        current_team_idx = game['current_turn_index'] % len(teams)
+        current_team = teams[current_team_idx]
 
-        avg_score = total_score / total_games if total_games > 0 else 0
-        win_rate = (wins / total_games * 100) if total_games > 0 else 0
+        team_turns_count = get_team_turns_count(game['current_turn_index'], len(teams))
 
-        return {
-            "player_id": player['id'],
-            "name": player['name'],
-            "number": player['number'],
-            "total_games": total_games,
-            "wins": wins,
-            "win_rate": round(win_rate, 1),
-            "avg_score": round(avg_score, 1),
-            "high_score_solo": high_score_solo,
-            "high_score_duo": high_score_duo,
-            "high_score_trio": high_score_trio,
-            "high_score_group": high_score_group
+        players_list = current_team['players']
+        if not players_list:
+            current_player_name = "Unknown"
+        else:
+            player_idx = team_turns_count % len(players_list)
+            current_player_name = players_list[player_idx]['name']
+
+        current_turn_info = {
+            "turn_number": game['current_turn_index'] + 1,
+            "team_id": current_team['id'],
+            "player": current_player_name,
+            "started_at": game['turn_started_at']
         }
 
-    finally:
-        conn.close()
-
-@app.get("/history")
-def get_history():
-    conn = get_db_connection()
-    games = conn.execute("SELECT * FROM games WHERE status = 'finished' ORDER BY ended_at DESC").fetchall()
+    return {
+        "game_id": game['id'],
+        "status": game['status'],
+        "turn_duration": game['turn_duration'],
+        "current_turn": current_turn_info,
+        "teams": [
+            {
+                "id": t['id'],
+                "name": t['name'],
+                "players": [p['name'] for p in t['players']],
+                "score": t['score']
+            }
+            for t in teams
+        ]
+    }
+
+def build_player_stats(conn, player_id: str) -> Dict[str, Any]:
+    # Totals are maintained by end_game, so this is a single row lookup
+    row = conn.execute("""
+        SELECT p.id, p.name, p.number,
+               COALESCE(s.total_games, 0) AS total_games,
+               COALESCE(s.wins, 0) AS wins,
+               COALESCE(s.total_score, 0) AS total_score,
+               COALESCE(s.high_score_solo, 0) AS high_score_solo,
+               COALESCE(s.high_score_duo, 0) AS high_score_duo,
+               COALESCE(s.high_score_trio, 0) AS high_score_trio,
+               COALESCE(s.high_score_group, 0) AS high_score_group
+        FROM players p
+        LEFT JOIN player_stats s ON s.player_id = p.id
+        WHERE p.id = ?
+    """, (player_id,)).fetchone()
+    if not row:
+        raise HTTPException(404, "Player not found")
+
+    total_games = row['total_games']
+    avg_score = row['total_score'] / total_games if total_games > 0 else 0
+    win_rate = (row['wins'] / total_games * 100) if total_games > 0 else 0
+
+    return {
+        "player_id": row['id'],
+        "name": row['name'],
+        "number": row['number'],
+        "total_games": total_games,
+        "wins": row['wins'],
+        "win_rate": round(win_rate, 1),
+        "avg_score": round(avg_score, 1),
+        "high_score_solo": row['high_score_solo'],
+        "high_score_duo": row['high_score_duo'],
+        "high_score_trio": row['high_score_trio'],
+        "high_score_group": row['high_score_group']
+    }
+
+def build_history(conn) -> List[Dict[str, Any]]:
+    # Every finished game with its top-scoring team and team count in one query
+    games = conn.execute("""
+        SELECT g.id, g.name, g.ended_at,
+               t.id AS winner_team_id, t.name AS winner, t.score AS top_score, t.teams_count
+        FROM games g
+        LEFT JOIN (
+            SELECT id, game_id, name, score,
+                   COUNT(*) OVER (PARTITION BY game_id) AS teams_count,
+                   ROW_NUMBER() OVER (PARTITION BY game_id ORDER BY score DESC, rowid) AS rn
+            FROM teams
+            WHERE game_id IN (SELECT id FROM games WHERE status = 'finished')
+        ) t ON t.game_id = g.id AND t.rn = 1
+        WHERE g.status = 'finished'
+        ORDER BY g.ended_at DESC
+    """).fetchall()
+
+    # Player names of all winning teams in one more query. The ids go in as
+    # a single JSON array so the statement text stays the same for any count.
+    winner_team_ids = [g['winner_team_id'] for g in games if g['winner_team_id']]
+    winner_players_by_team = {team_id: [] for team_id in winner_team_ids}
+    if winner_team_ids:
+        wp_rows = conn.execute("""
+            SELECT gp.team_id, p.name FROM players p
+            JOIN game_players gp ON p.id = gp.player_id
+            WHERE gp.team_id IN (SELECT value FROM json_each(?))
+            ORDER BY gp.rowid
+        """, (json.dumps(winner_team_ids),)).fetchall()
+        for r in wp_rows:
+            winner_players_by_team[r['team_id']].append(r['name'])
 
     history = []
     for g in games:
-        teams = conn.execute("SELECT * FROM teams WHERE game_id = ? ORDER BY score DESC", (g['id'],)).fetchall()
-        winner = teams[0]['name'] if teams else "Unknown"
-        top_score = teams[0]['score'] if teams else 0
-
-        # Get players for the winning team just for display? Or maybe all teams?
-        # The history API was basic. Let's keep it basic but maybe add winner details if needed.
-        # But previous code didn't ask for player names in history list specifically, but point 7 says:
-        # "metrics shown on the front page, and along with the team name, player names should also be mentioned"
-        # I should probably update history to return player names for the winner at least.
-
-        winner_players = []
-        if teams:
-             winner_team_id = teams[0]['id']
-             wp_rows = conn.execute("""
-                SELECT p.name FROM players p
-                JOIN game_players gp ON p.id = gp.player_id
-                WHERE gp.team_id = ?
-             """, (winner_team_id,)).fetchall()
-             winner_players = [r['name'] for r in wp_rows]
+        winner = g['winner'] if g['winner_team_id'] else "Unknown"
+        top_score = g['top_score'] if g['winner_team_id'] else 0
+        winner_players = winner_players_by_team.get(g['winner_team_id'], [])
 
         history.append({
             "game_id": g['id'],
@@ -262,158 +398,223 @@ def get_history():
             "winner": winner,
             "winner_players": winner_players, # Added field
             "top_score": top_score,
-            "teams_count": len(teams)
+            "teams_count": g['teams_count'] or 0
         })
-    conn.close()
     return history
 
-@app.post("/games")
-def create_game(req: CreateGameRequest):
-    conn = get_db_connection()
-    game_id = str(uuid4())
-    try:
-        conn.execute(
-            "INSERT INTO games (id, name, status, turn_duration, turn_started_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (game_id, req.name, "active", req.turn_duration, now(), now())
+def with_connection(build, *args):
+    # Lets async routes run a build_* helper on a pooled connection through
+    # run_in_threadpool, keeping the blocking sqlite3 calls off the event loop
+    with connection() as conn:
+        return build(conn, *args)
+
+def record_player_stats(conn, game_id: str):
+    # Add a just-finished game to the running totals of every player in it,
+    # aggregated in SQL. A tie for the top score counts as a win for each tied team.
+    conn.execute("""
+        INSERT INTO player_stats (
+            player_id, total_games, wins, total_score,
+            high_score_solo, high_score_duo, high_score_trio, high_score_group
         )
+        SELECT r.player_id,
+               COUNT(*),
+               SUM(r.score = r.winning_score AND r.score > 0),
+               SUM(r.score),
+               MAX(CASE WHEN r.team_size = 1 THEN MAX(r.score, 0) ELSE 0 END),
+               MAX(CASE WHEN r.team_size = 2 THEN MAX(r.score, 0) ELSE 0 END),
+               MAX(CASE WHEN r.team_size = 3 THEN MAX(r.score, 0) ELSE 0 END),
+               MAX(CASE WHEN r.team_size > 3 THEN MAX(r.score, 0) ELSE 0 END)
+        FROM (
+            SELECT gp.player_id, t.score,
+                   COUNT(*) OVER (PARTITION BY gp.team_id) AS team_size,
+                   MAX(t.score) OVER () AS winning_score
+            FROM game_players gp
+            JOIN teams t ON t.id = gp.team_id
+            WHERE t.game_id = ?
+        ) r
+        JOIN players p ON p.id = r.player_id
+        GROUP BY r.player_id
+        ON CONFLICT (player_id) DO UPDATE SET
+            total_games = total_games + excluded.total_games,
+            wins = wins + excluded.wins,
+            total_score = total_score + excluded.total_score,
+            high_score_solo = MAX(high_score_solo, excluded.high_score_solo),
+            high_score_duo = MAX(high_score_duo, excluded.high_score_duo),
+            high_score_trio = MAX(high_score_trio, excluded.high_score_trio),
+            high_score_group = MAX(high_score_group, excluded.high_score_group)
+    """, (game_id,))
+
+def calculate_time_left(turn_started_at: Optional[float], turn_duration: int) -> int:
+    if turn_started_at is None:
+        return turn_duration
+    return max(0, turn_duration - int(time.time() - turn_started_at))
 
-        for team_req in req.teams:
-            team_id = str(uuid4())
-            conn.execute(
-                "INSERT INTO teams (id, game_id, name, score) VALUES (?, ?, ?, ?)",
-                (team_id, game_id, team_req.name, 0)
-            )
+# --------------------
+# Routes
+# --------------------
+
+@app.get("/players", response_model=List[Player])
+def search_players(
+    query: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    with connection() as conn:
+        if query:
+            wildcard = f"%{query}%"
+            # Each LIKE is answered by the trigram index on players_fts
+            players = conn.execute("""
+                SELECT * FROM players WHERE id IN (
+                    SELECT id FROM players_fts WHERE name LIKE ?
+                    UNION
+                    SELECT id FROM players_fts WHERE number LIKE ?
+                )
+                ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?
+            """, (wildcard, wildcard, limit, offset)).fetchall()
+        else:
+            players = conn.execute(
+                "SELECT * FROM players ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+    return players
 
-            for player_id in team_req.players:
+@app.post("/players", response_model=Player)
+def register_player(req: PlayerCreate):
+    with connection() as conn:
+        try:
+            # Returns the existing row when this name and number are already registered
+            player = conn.execute(
+                """INSERT INTO players (id, name, number, created_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (name, number) DO UPDATE SET name = excluded.name
+                   RETURNING id, name, number, created_at""",
+                (str(uuid4()), req.name, req.number, now())
+            ).fetchone()
+            conn.commit()
+            return player
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(400, f"Error registering player: {str(e)}")
+
+@app.get("/stats/players/{player_id}", response_model=PlayerStats)
+async def get_player_stats(player_id: str):
+    key = ("stats", player_id)
+    stats, version = RESULTS_CACHE.lookup(key)
+    if stats is None:
+        stats = await run_in_threadpool(with_connection, build_player_stats, player_id)
+        RESULTS_CACHE.store(key, stats, version)
+    return stats
+
+@app.get("/history", response_model=List[HistoryEntry])
+async def get_history():
+    history, version = RESULTS_CACHE.lookup("history")
+    if history is None:
+        history = await run_in_threadpool(with_connection, build_history)
+        RESULTS_CACHE.store("history", history, version)
+    return history
+
+@app.post("/games")
+def create_game(req: CreateGameRequest):
+    # Build every row before taking the write lock
+    game_id = str(uuid4())
+    team_rows = []
+    game_player_rows = []
+    for team_req in req.teams:
+        team_id = str(uuid4())
+        team_rows.append((team_id, game_id, team_req.name, 0))
+        game_player_rows.extend((game_id, team_id, player_id) for player_id in team_req.players)
+
+    with connection() as conn:
+        try:
+            with write_transaction(conn):
                 conn.execute(
+                    "INSERT INTO games (id, name, status, turn_duration, turn_started_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (game_id, req.name, "active", req.turn_duration, now_epoch(), now())
+                )
+                conn.executemany(
+                    "INSERT INTO teams (id, game_id, name, score) VALUES (?, ?, ?, ?)",
+                    team_rows
+                )
+                conn.executemany(
                     "INSERT INTO game_players (game_id, team_id, player_id) VALUES (?, ?, ?)",
-                    (game_id, team_id, player_id)
+                    game_player_rows
                 )
+            return {"game_id": game_id, "status": "active"}
+        except Exception as e:
+            raise HTTPException(400, f"Failed to create game: {str(e)}")
+
+@app.get("/games/{game_id}", response_model=GameState)
+async def get_game_state(game_id: str):
+    state, version = GAME_CACHE.lookup(game_id)
+    if state is None:
+        state = await run_in_threadpool(with_connection, build_game_state, game_id)
+        GAME_CACHE.store(game_id, state, version)
+
+    # time_left is the only part that changes between writes
+    current_turn = state['current_turn']
+    if current_turn is not None:
+        current_turn = {
+            **current_turn,
+            "time_left": calculate_time_left(current_turn['started_at'], state['turn_duration'])
+        }
+    return {**state, "current_turn": current_turn}
 
-        conn.commit()
-        return {"game_id": game_id, "status": "active"}
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(400, f"Failed to create game: {str(e)}")
-    finally:
-        conn.close()
-
-@app.get("/games/{game_id}")
-def get_game_state(game_id: str):
-    conn = get_db_connection()
-    try:
-        game = get_game_from_db(conn, game_id)
-        teams = get_teams_from_db(conn, game_id)
-        turns = get_turns_from_db(conn, game_id)
+@app.post("/games/{game_id}/turns", response_model=SubmitTurnResponse)
+def submit_turn(game_id: str, req: SubmitTurnRequest):
+    with connection() as conn:
+        with game_write_transaction(conn, game_id):
+            game = get_game_from_db(conn, game_id)
+            if game['status'] == 'finished':
+                 raise HTTPException(400, "Game is finished")
 
-        if game['status'] == 'finished':
-            current_turn_info = None
-        else:
+            teams = get_teams_from_db(conn, game_id)
             current_team_idx = game['current_turn_index'] % len(teams)
             current_team = teams[current_team_idx]
 
-            team_turns_count = conn.execute(
-                "SELECT COUNT(*) FROM turns WHERE game_id = ? AND team_id = ?",
-                (game_id, current_team['id'])
-            ).fetchone()[0]
-
+            team_turns_count = get_team_turns_count(game['current_turn_index'], len(teams))
             players_list = current_team['players']
-            if not players_list:
-                current_player_name = "Unknown"
-            else:
-                player_idx = team_turns_count % len(players_list)
-                current_player_name = players_list[player_idx]['name']
-
-            current_turn_info = {
-                "turn_number": len(turns) + 1,
-                "team_id": current_team['id'],
-                "player": current_player_name,
-                "started_at": game['turn_started_at'],
-                "time_left": calculate_time_left(game['turn_started_at'], game['turn_duration'])
-            }
-
-        return {
-            "game_id": game['id'],
-            "status": game['status'],
-            "turn_duration": game['turn_duration'],
-            "current_turn": current_turn_info,
-            "teams": [
-                {
-                    "id": t['id'],
-                    "name": t['name'],
-                    "players": [p['name'] for p in t['players']],
-                    "score": t['score']
-                }
-                for t in teams
-            ]
-        }
-    finally:
-        conn.close()
-
-@app.post("/games/{game_id}/turns")
-def submit_turn(game_id: str, req: SubmitTurnRequest):
-    conn = get_db_connection()
-    try:
-        game = get_game_from_db(conn, game_id)
-        if game['status'] == 'finished':
-             raise HTTPException(400, "Game is finished")
+            player_idx = team_turns_count % len(players_list)
+            current_player = players_list[player_idx]
 
-        teams = get_teams_from_db(conn, game_id)
-        current_team_idx = game['current_turn_index'] % len(teams)
-        current_team = teams[current_team_idx]
+            total_score = req.base_score + (50 if req.bingo else 0)
 
-        team_turns_count = conn.execute(
-            "SELECT COUNT(*) FROM turns WHERE game_id = ? AND team_id = ?",
-            (game_id, current_team['id'])
-        ).fetchone()[0]
-        players_list = current_team['players']
-        player_idx = team_turns_count % len(players_list)
-        current_player = players_list[player_idx]
-
-        total_score = req.base_score + (50 if req.bingo else 0)
-
-        conn.execute(
-            """INSERT INTO turns (turn_number, game_id, team_id, player_id, base_score, bingo, total_score, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                game['current_turn_index'] + 1,
-                game_id,
-                current_team['id'],
-                current_player['id'],
-                req.base_score,
-                req.bingo,
-                total_score,
-                now()
+            conn.execute(
+                """INSERT INTO turns (turn_number, game_id, team_id, player_id, base_score, bingo, total_score, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    game['current_turn_index'] + 1,
+                    game_id,
+                    current_team['id'],
+                    current_player['id'],
+                    req.base_score,
+                    req.bingo,
+                    total_score,
+                    now()
+                )
             )
-        )
 
-        conn.execute(
-            "UPDATE teams SET score = score + ? WHERE id = ?",
-            (total_score, current_team['id'])
-        )
+            current_team['score'] = conn.execute(
+                "UPDATE teams SET score = score + ? WHERE id = ? RETURNING score",
+                (total_score, current_team['id'])
+            ).fetchone()['score']
 
-        conn.execute(
-            "UPDATE games SET current_turn_index = current_turn_index + 1, turn_started_at = ? WHERE id = ?",
-            (now(), game_id)
-        )
+            game = {**game, **conn.execute(
+                """UPDATE games SET current_turn_index = current_turn_index + 1, turn_started_at = ? WHERE id = ?
+                   RETURNING current_turn_index, turn_started_at""",
+                (now_epoch(), game_id)
+            ).fetchone()}
 
-        conn.commit()
+            GAME_CACHE.replace(game_id, assemble_game_state(game, teams))
 
-        game = get_game_from_db(conn, game_id)
         next_team_idx = game['current_turn_index'] % len(teams)
         next_team = teams[next_team_idx]
 
-        next_team_turns_count = conn.execute(
-            "SELECT COUNT(*) FROM turns WHERE game_id = ? AND team_id = ?",
-            (game_id, next_team['id'])
-        ).fetchone()[0]
+        next_team_turns_count = get_team_turns_count(game['current_turn_index'], len(teams))
         next_players_list = next_team['players']
         next_player_idx = next_team_turns_count % len(next_players_list)
         next_player_name = next_players_list[next_player_idx]['name']
 
-        teams_refreshed = get_teams_from_db(conn, game_id)
         leaderboard = sorted(
-             [{"team_id": t['id'], "name": t['name'], "score": t['score']} for t in teams_refreshed],
+             [{"team_id": t['id'], "name": t['name'], "score": t['score']} for t in teams],
              key=lambda x: x['score'],
              reverse=True
         )
@@ -436,45 +637,43 @@ def submit_turn(game_id: str, req: SubmitTurnRequest):
             "leaderboard": leaderboard
         }
 
-    finally:
-        conn.close()
-
-@app.post("/games/{game_id}/undo")
+@app.post("/games/{game_id}/undo", response_model=UndoResponse)
 def undo_last_turn(game_id: str):
-    conn = get_db_connection()
-    try:
-        game = get_game_from_db(conn, game_id)
-        last_turn = conn.execute(
-            "SELECT * FROM turns WHERE game_id = ? ORDER BY id DESC LIMIT 1",
-            (game_id,)
-        ).fetchone()
-
-        if not last_turn:
-            raise HTTPException(400, "No turns to undo")
-
-        conn.execute(
-            "UPDATE teams SET score = score - ? WHERE id = ?",
-            (last_turn['total_score'], last_turn['team_id'])
-        )
+    with connection() as conn:
+        with game_write_transaction(conn, game_id):
+            game = get_game_from_db(conn, game_id)
+            # Finished games are already counted in player_stats
+            if game['status'] == 'finished':
+                raise HTTPException(400, "Game is finished")
+
+            last_turn = conn.execute(
+                """DELETE FROM turns
+                   WHERE id = (SELECT id FROM turns WHERE game_id = ? ORDER BY id DESC LIMIT 1)
+                   RETURNING turn_number, team_id, total_score""",
+                (game_id,)
+            ).fetchone()
+
+            if not last_turn:
+                raise HTTPException(400, "No turns to undo")
 
-        conn.execute("DELETE FROM turns WHERE id = ?", (last_turn['id'],))
+            conn.execute(
+                "UPDATE teams SET score = score - ? WHERE id = ?",
+                (last_turn['total_score'], last_turn['team_id'])
+            )
 
-        conn.execute(
-            "UPDATE games SET current_turn_index = current_turn_index - 1, turn_started_at = ? WHERE id = ?",
-            (now(), game_id)
-        )
+            game = {**game, **conn.execute(
+                """UPDATE games SET current_turn_index = current_turn_index - 1, turn_started_at = ? WHERE id = ?
+                   RETURNING current_turn_index, turn_started_at""",
+                (now_epoch(), game_id)
+            ).fetchone()}
 
-        conn.commit()
+            teams = get_teams_from_db(conn, game_id)
+            GAME_CACHE.replace(game_id, assemble_game_state(game, teams))
 
-        game = get_game_from_db(conn, game_id)
-        teams = get_teams_from_db(conn, game_id)
         current_team_idx = game['current_turn_index'] % len(teams)
         current_team = teams[current_team_idx]
 
-        team_turns_count = conn.execute(
-            "SELECT COUNT(*) FROM turns WHERE game_id = ? AND team_id = ?",
-            (game_id, current_team['id'])
-        ).fetchone()[0]
+        team_turns_count = get_team_turns_count(game['current_turn_index'], len(teams))
         players_list = current_team['players']
         player_idx = team_turns_count % len(players_list)
         current_player_name = players_list[player_idx]['name']
@@ -489,17 +688,24 @@ def undo_last_turn(game_id: str):
             },
             "teams": [{"id": t['id'], "score": t['score']} for t in teams]
         }
-    finally:
-        conn.close()
 
 @app.post("/games/{game_id}/end")
 def end_game(game_id: str):
-    conn = get_db_connection()
-    try:
-        conn.execute("UPDATE games SET status = 'finished', ended_at = ? WHERE id = ?", (now(), game_id))
-        conn.commit()
+    with connection() as conn:
+        with write_transaction(conn):
+            # Only the first end of a game counts towards player stats
+            ended = conn.execute(
+                "UPDATE games SET status = 'finished', ended_at = ? WHERE id = ? AND status != 'finished' RETURNING id",
+                (now(), game_id)
+            ).fetchone()
+
+            if ended:
+                record_player_stats(conn, game_id)
+            teams = get_teams_from_db(conn, game_id)
+
+        GAME_CACHE.invalidate(game_id)
+        RESULTS_CACHE.invalidate()
 
-        teams = get_teams_from_db(conn, game_id)
         scores = sorted(teams, key=lambda t: t['score'], reverse=True)
         winner = scores[0]['name'] if scores else None
 
@@ -514,5 +720,3 @@ def end_game(game_id: str):
             ],
             "winner": winner
         }
-    finally:
-        conn.close()
@@ -3,6 +3,7 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 import sqlite3
+from datetime import datetime, timedelta, timezone
 
 # Set environment variable for test database before importing app
 TEST_DB = "test_scrabble.db"
@@ -14,11 +15,16 @@ from backend.database import init_db, get_db_connection
 
 client = TestClient(app)
 
+def remove_test_db():
+    # WAL mode leaves -wal/-shm files next to the database
+    for path in (TEST_DB, TEST_DB + "-wal", TEST_DB + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
 @pytest.fixture(scope="module", autouse=True)
 def setup_database():
     # Remove existing test db if any
-    if os.path.exists(TEST_DB):
-        os.remove(TEST_DB)
+    remove_test_db()
 
     # Initialize the database
     init_db()
@@ -26,8 +32,7 @@ def setup_database():
     yield
 
     # Cleanup
-    if os.path.exists(TEST_DB):
-        os.remove(TEST_DB)
+    remove_test_db()
 
 def test_create_player():
     response = client.post("/players", json={"name": "Alice", "number": "123"})
@@ -37,6 +42,24 @@ def test_create_player():
     assert data["number"] == "123"
     assert "id" in data
 
+def test_register_existing_player():
+    first = client.post("/players", json={"name": "Dana", "number": "321"}).json()
+    again = client.post("/players", json={"name": "Dana", "number": "321"})
+    assert again.status_code == 200
+    assert again.json()["id"] == first["id"]
+    assert again.json()["created_at"] == first["created_at"]
+
+    # The no-op upsert must not touch the search index
+    conn = get_db_connection()
+    try:
+        count = conn.execute(
+            "SELECT COUNT(*) AS n FROM players_fts WHERE id = ?", (first["id"],)
+        ).fetchone()['n']
+    finally:
+        conn.close()
+    assert count == 1
+    assert len(client.get("/players?query=Dana").json()) == 1
+
 def test_search_player():
     client.post("/players", json={"name": "Bob", "number": "456"})
     response = client.get("/players?query=Bob")
@@ -45,6 +68,19 @@ def test_search_player():
     assert len(data) >= 1
     assert data[0]["name"] == "Bob"
 
+def test_search_player_pagination():
+    for i in range(3):
+        client.post("/players", json={"name": f"Page{i}", "number": f"90{i}"})
+
+    first = client.get("/players?query=Page&limit=2").json()
+    rest = client.get("/players?query=Page&limit=2&offset=2").json()
+    assert len(first) == 2
+    assert len(rest) == 1
+    assert {p["name"] for p in first + rest} == {"Page0", "Page1", "Page2"}
+
+    response = client.get("/players?limit=0")
+    assert response.status_code == 422
+
 def test_create_game_and_play():
     # 1. Create Players
     p1_res = client.post("/players", json={"name": "P1", "number": "001"})
@@ -121,3 +157,180 @@ def test_player_stats():
     assert stats["total_games"] >= 1
     assert stats["high_score_solo"] >= 100
     assert stats["avg_score"] >= 100
+
+def test_game_state_refreshes_after_turn():
+    p1_id = client.post("/players", json={"name": "Cache1", "number": "201"}).json()["id"]
+    p2_id = client.post("/players", json={"name": "Cache2", "number": "202"}).json()["id"]
+    game_data = {
+        "name": "Cache Game",
+        "turn_duration": 60,
+        "teams": [
+            {"name": "Team A", "players": [p1_id]},
+            {"name": "Team B", "players": [p2_id]}
+        ]
+    }
+    g_id = client.post("/games", json=game_data).json()["game_id"]
+
+    # Prime the cached state, then make sure writes are reflected
+    state = client.get(f"/games/{g_id}").json()
+    assert state["current_turn"]["player"] == "Cache1"
+    assert state["current_turn"]["time_left"] <= 60
+
+    client.post(f"/games/{g_id}/turns", json={"base_score": 12, "bingo": False})
+    state = client.get(f"/games/{g_id}").json()
+    assert state["current_turn"]["player"] == "Cache2"
+    assert state["teams"][0]["score"] == 12
+
+    undo = client.post(f"/games/{g_id}/undo").json()
+    assert undo["current_turn"]["player"] == "Cache1"
+    # Served as ISO-8601 like the other routes, not the stored epoch seconds
+    assert isinstance(undo["current_turn"]["started_at"], str)
+    datetime.fromisoformat(undo["current_turn"]["started_at"].replace("Z", "+00:00"))
+
+    state = client.get(f"/games/{g_id}").json()
+    assert state["current_turn"]["player"] == "Cache1"
+    assert state["teams"][0]["score"] == 0
+
+def test_results_refresh_after_game_end():
+    p_id = client.post("/players", json={"name": "Repeat", "number": "301"}).json()["id"]
+
+    def play_game(name):
+        g_id = client.post("/games", json={
+            "name": name,
+            "turn_duration": 60,
+            "teams": [{"name": "Solo", "players": [p_id]}]
+        }).json()["game_id"]
+        client.post(f"/games/{g_id}/turns", json={"base_score": 20, "bingo": False})
+        client.post(f"/games/{g_id}/end")
+        return g_id
+
+    play_game("First")
+    assert client.get(f"/stats/players/{p_id}").json()["total_games"] == 1
+    history_len = len(client.get("/history").json())
+
+    # Ending another game must not serve the cached stats or history
+    g_id = play_game("Second")
+    assert client.get(f"/stats/players/{p_id}").json()["total_games"] == 2
+    history = client.get("/history").json()
+    assert len(history) == history_len + 1
+    assert any(g["game_id"] == g_id for g in history)
+
+def test_finished_game_counts_once():
+    p_id = client.post("/players", json={"name": "Once", "number": "401"}).json()["id"]
+    g_id = client.post("/games", json={
+        "name": "Once Game",
+        "turn_duration": 60,
+        "teams": [{"name": "Solo", "players": [p_id]}]
+    }).json()["game_id"]
+    client.post(f"/games/{g_id}/turns", json={"base_score": 30, "bingo": False})
+
+    assert client.post(f"/games/{g_id}/end").status_code == 200
+    assert client.post(f"/games/{g_id}/end").status_code == 200
+    assert client.post(f"/games/{g_id}/undo").status_code == 400
+
+    stats = client.get(f"/stats/players/{p_id}").json()
+    assert stats["total_games"] == 1
+    assert stats["wins"] == 1
+    assert stats["high_score_solo"] == 30
+
+def test_poll_during_turn_does_not_cache_stale_state():
+    from contextlib import contextmanager
+    from backend import main
+
+    p1_id = client.post("/players", json={"name": "Race1", "number": "501"}).json()["id"]
+    p2_id = client.post("/players", json={"name": "Race2", "number": "502"}).json()["id"]
+    g_id = client.post("/games", json={
+        "name": "Race Game",
+        "turn_duration": 60,
+        "teams": [
+            {"name": "Team A", "players": [p1_id]},
+            {"name": "Team B", "players": [p2_id]}
+        ]
+    }).json()["game_id"]
+
+    poll = {}
+    write_transaction = main.write_transaction
+
+    @contextmanager
+    def write_transaction_with_polls(conn):
+        with write_transaction(conn):
+            # One poll misses before the turn's writes and stores late
+            _, poll["version"] = main.GAME_CACHE.lookup(g_id)
+            yield conn
+            # Another polls after the writes but before COMMIT, reading the
+            # pre-turn snapshot, and then some other game is written
+            poll["state"] = main.with_connection(main.build_game_state, g_id)
+            state, version = main.GAME_CACHE.lookup(g_id)
+            if state is None:
+                main.GAME_CACHE.store(g_id, poll["state"], version)
+            main.GAME_CACHE.invalidate("another-game")
+
+    with patch.object(main, "write_transaction", write_transaction_with_polls):
+        client.post(f"/games/{g_id}/turns", json={"base_score": 12, "bingo": False})
+
+    main.GAME_CACHE.store(g_id, poll["state"], poll["version"])
+    main.GAME_CACHE.invalidate("another-game")
+
+    state = client.get(f"/games/{g_id}").json()
+    assert state["current_turn"]["player"] == "Race2"
+    assert [t["score"] for t in state["teams"]] == [12, 0]
+
+def test_upgrade_from_unversioned_database(tmp_path):
+    from backend import database
+    from backend.main import calculate_time_left
+
+    # Tables and values as written before the schema was versioned
+    path = str(tmp_path / "old.db")
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE players (id TEXT PRIMARY KEY, name TEXT NOT NULL, number TEXT NOT NULL,
+                              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(name, number));
+        CREATE TABLE games (id TEXT PRIMARY KEY, name TEXT NOT NULL, status TEXT NOT NULL,
+                            turn_duration INTEGER NOT NULL, current_turn_index INTEGER DEFAULT 0,
+                            turn_started_at TIMESTAMP, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            ended_at TIMESTAMP);
+        CREATE TABLE teams (id TEXT PRIMARY KEY, game_id TEXT NOT NULL, name TEXT NOT NULL,
+                            score INTEGER DEFAULT 0);
+        CREATE TABLE game_players (game_id TEXT NOT NULL, team_id TEXT NOT NULL, player_id TEXT NOT NULL);
+        CREATE TABLE turns (id INTEGER PRIMARY KEY AUTOINCREMENT, turn_number INTEGER NOT NULL,
+                            game_id TEXT NOT NULL, team_id TEXT NOT NULL, player_id TEXT NOT NULL,
+                            base_score INTEGER NOT NULL, bingo BOOLEAN NOT NULL, total_score INTEGER NOT NULL,
+                            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+
+        INSERT INTO players (id, name, number) VALUES ('p1', 'Old1', '1'), ('p2', 'Old2', '2');
+        INSERT INTO games (id, name, status, turn_duration, turn_started_at, ended_at)
+        VALUES ('done', 'Done', 'finished', 60, '2024-01-01 12:00:00+00:00', '2024-01-01 13:00:00+00:00');
+        INSERT INTO teams (id, game_id, name, score) VALUES ('t1', 'done', 'A', 40), ('t2', 'done', 'B', 25);
+        INSERT INTO game_players VALUES ('done', 't1', 'p1'), ('done', 't2', 'p2');
+    """)
+    started = datetime.now(timezone.utc) - timedelta(seconds=10.5)
+    old.execute(
+        "INSERT INTO games (id, name, status, turn_duration, turn_started_at) VALUES ('live', 'Live', 'active', 60, ?)",
+        (str(started),)
+    )
+    old.commit()
+    old.close()
+
+    with patch.object(database, "DB_NAME", path):
+        database.init_db()
+        conn = database.get_db_connection()
+        try:
+            stats = {
+                row['player_id']: row
+                for row in conn.execute("SELECT * FROM player_stats")
+            }
+            started_at = conn.execute(
+                "SELECT turn_started_at FROM games WHERE id = 'live'"
+            ).fetchone()['turn_started_at']
+        finally:
+            conn.close()
+
+    assert stats['p1']['total_games'] == 1
+    assert stats['p1']['wins'] == 1
+    assert stats['p1']['high_score_solo'] == 40
+    assert stats['p2']['wins'] == 0
+    assert stats['p2']['total_score'] == 25
+
+    # Converted to Unix seconds without losing the fraction
+    assert abs(started_at - started.timestamp()) < 0.01
+    assert calculate_time_left(started_at, 60) == 50